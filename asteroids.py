@@ -9,11 +9,15 @@
 #              game and a 'main' function for running it.
 #-------------------------------------------------------------------------------
 
-import random
+import math
+from collections import deque
+import numpy as np
 import pygame
 from pygame import mixer, mouse
 import game
+import kernels
 import shapes
+from spatial_hash import SpatialHash
 from config import *
 
 #-------------------------------------------------------------------------------
@@ -21,7 +25,9 @@ from config import *
 #
 # Description: Manages a modified version of the classic Asteroids game.
 #
-#     Methods: __init__, game_logic, paint, spawn_asteroids
+#     Methods: __init__, game_logic, paint, spawn_asteroids, destroy_asteroid,
+#              get_random_points, _fire, _spawn_asteroid, _activate,
+#              _deactivate, _fill_rows, _outline_rows
 #-------------------------------------------------------------------------------
 class AsteroidsGame(game.Game):
     #---------------------------------------------------------------------------
@@ -36,21 +42,77 @@ class AsteroidsGame(game.Game):
     def __init__(self, fps=FRAMES_PER_SECOND):
         game.Game.__init__(self, fps)
         mouse.set_visible(False)
+        kernels.warm_up() # compile any Numba kernels now, not mid-game
+        self._rng = np.random.default_rng()
 
         # Create the ship and place it in the center of the screen:
         center = shapes.Point(self.width // 2, self.height // 2)
         self.ship = shapes.Ship(center, SHIP_INITIAL_ROTATION, SHIP_COLOR)
 
-        # Create bullet and upgrade lists:
-        self.bullets = []
-        self.upgrades = []
+        # Create pools of reusable (initially inactive) bullets and upgrades,
+        # along with queues of the ones currently available:
+        self.bullets = [shapes.Bullet(center, 0) for i in range(MAX_BULLETS)]
+        self.upgrades = [shapes.Upgrade(center) for i in range(MAX_UPGRADES)]
+        for o in self.bullets + self.upgrades:
+            o.active = False
+        self._free_bullets = deque(self.bullets)
+        self._free_upgrades = deque(self.upgrades)
+        self._active_bullets = []
+        self._fire_keys = frozenset((pygame.K_SPACE, pygame.K_RETURN,
+                                     pygame.K_KP_ENTER, pygame.K_LCTRL,
+                                     pygame.K_RCTRL))
 
-        # Create asteroids and background stars:
-        self.asteroids = []
+        # Create arrays holding the position and velocity of each active
+        # bullet, with row i belonging to the i-th active bullet:
+        self._bul_pos = np.empty((MAX_BULLETS, 2), dtype=np.float32)
+        self._bul_vel = np.empty((MAX_BULLETS, 2), dtype=np.float32)
+
+        # Create an array mirroring asteroid positions, as (x, y, radius,
+        # squared distance within which the ship may be hit) rows, for
+        # vectorized collision checks:
+        self._ast_rows = np.empty((0, 4), dtype=np.float32)
+
+        # Create a spatial hash for finding asteroids near a given object:
+        self._grid = SpatialHash(SPATIAL_HASH_CELL_SIZE)
+        self._candidates = []
+        self._pair_bullets = []
+
+        # Create a pool of asteroids large enough for every large asteroid to
+        # be split down to the smallest size, then the first set of asteroids:
+        large_count = int(self.width * ASTEROID_DENSITY)
+        pool_size = large_count
+        radius = ASTEROID_MAX_RADIUS // 2
+        while radius >= ASTEROID_MIN_RADIUS:
+            large_count *= 2
+            pool_size += large_count
+            radius //= 2
+        self.asteroids = [shapes.Asteroid(ASTEROID_MAX_RADIUS, center)
+                          for i in range(pool_size)]
+        for a in self.asteroids:
+            a.active = False
+        self._free_asteroids = deque(self.asteroids)
+        self._active_asteroids = []
         self.spawn_asteroids()
-        self.stars = []
-        while len(self.stars) < (self.width * STAR_DENSITY):
-            self.stars.append(shapes.Star(self.get_random_point()))
+
+        # Create background stars:
+        star_count = math.ceil(self.width * STAR_DENSITY)
+        self.stars = [shapes.Star(p)
+                      for p in self.get_random_points(star_count)]
+
+        # Pre-render stars (at every brightness) and bullets for batched
+        # drawing. Stars never move, so their blit positions are fixed:
+        self._star_sprites = [shapes.circle_sprite((b, b, b), STAR_RADIUS)
+                              for b in range(256)]
+        self._star_brightness = np.array([s.color[0] for s in self.stars],
+                                         dtype=np.int32)
+        self._star_twinkle_rates = np.array([s.twinkle_rate
+                                             for s in self.stars],
+                                            dtype=np.int32)
+        radius = int(STAR_RADIUS)
+        self._star_blit_positions = [(x - radius, y - radius) for (x, y) in
+                                     (s.position.pair() for s in self.stars)]
+        self._bullet_sprite = shapes.circle_sprite(BULLET_COLOR, BULLET_RADIUS)
+        self._bullet_radius = int(BULLET_RADIUS)
 
         # Initialize mixer and start looping background music:
         mixer.init()
@@ -69,76 +131,158 @@ class AsteroidsGame(game.Game):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def game_logic(self, keys, new_keys):
+        # (Frequently used attributes are bound to locals up front, since local
+        # lookups are considerably cheaper than attribute lookups.)
+        ship = self.ship
+        (width, height) = (self.width, self.height)
+        (active_bullets, free_bullets) = (self._active_bullets,
+                                          self._free_bullets)
+        destroy_asteroid = self.destroy_asteroid
+        deactivate = self._deactivate
+
         # Ship:
-        self.ship.game_logic(keys, new_keys)
-        self.ship.boundary_check(self.width, self.height)
+        ship.game_logic(keys, new_keys)
+        ship.boundary_check(width, height)
 
         # Bullets:
-        if ((pygame.K_SPACE in new_keys or pygame.K_RETURN in new_keys or
-             pygame.K_KP_ENTER in new_keys or pygame.K_LCTRL in new_keys or
-             pygame.K_RCTRL in new_keys) and self.ship.active):
-            if self.ship.upgrade_level != 1:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[0],
-                                                  self.ship.rotation))
-            if self.ship.upgrade_level > 0:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[3],
-                                                  self.ship.rotation))
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[9],
-                                                  self.ship.rotation))
-            if self.ship.upgrade_level > 2:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[3],
-                                                  self.ship.rotation + 45))
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[9],
-                                                  self.ship.rotation - 45))
-            if self.ship.upgrade_level > 3:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[3],
-                                                  self.ship.rotation + 90))
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[9],
-                                                  self.ship.rotation - 90))
-            if self.ship.upgrade_level > 4:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[4],
-                                                  self.ship.rotation + 135))
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[8],
-                                                  self.ship.rotation - 135))
-            if self.ship.upgrade_level > 5:
-                self.bullets.append(shapes.Bullet(self.ship.get_points()[6],
-                                                  self.ship.rotation + 180))
-        for b in self.bullets:
-            b.game_logic(keys, new_keys)
-            if (b.position.x > self.width or b.position.x < 0 or
-                b.position.y > self.height or b.position.y < 0):
-                self.bullets.remove(b)
+        if ship.active and not self._fire_keys.isdisjoint(new_keys):
+            fire = self._fire
+            (xs, ys) = ship.get_points()
+            points = [shapes.Point(x, y)
+                      for (x, y) in zip(xs.tolist(), ys.tolist())]
+            rotation = ship.rotation
+            upgrade_level = ship.upgrade_level
+            if upgrade_level != 1:
+                fire(points[0], rotation)
+            if upgrade_level > 0:
+                fire(points[3], rotation)
+                fire(points[9], rotation)
+            if upgrade_level > 2:
+                fire(points[3], rotation + 45)
+                fire(points[9], rotation - 45)
+            if upgrade_level > 3:
+                fire(points[3], rotation + 90)
+                fire(points[9], rotation - 90)
+            if upgrade_level > 4:
+                fire(points[4], rotation + 135)
+                fire(points[8], rotation - 135)
+            if upgrade_level > 5:
+                fire(points[6], rotation + 180)
+        # (Bullets move as a batch, then each bullet's position is updated to
+        # match. Those leaving the screen are deactivated in reverse order,
+        # since deactivation moves the last active bullet into the vacated
+        # slot.)
+        bullet_arrays = (self._bul_pos, self._bul_vel)
+        pos = self._bul_pos[:len(active_bullets)]
+        pos += self._bul_vel[:len(active_bullets)]
+        for (b, (x, y)) in zip(active_bullets, pos.tolist()):
+            position = b.position
+            (position.x, position.y) = (x, y)
+            b.transform_generation += 1
+        (x, y) = (pos[:, 0], pos[:, 1])
+        on_screen = (0 <= x) & (x <= width) & (0 <= y) & (y <= height)
+        for i in np.flatnonzero(~on_screen)[::-1].tolist():
+            deactivate(active_bullets[i], active_bullets, free_bullets,
+                       bullet_arrays)
 
         # Upgrades:
         for u in self.upgrades:
-            u.game_logic()
-            if self.ship.active and self.ship.intersects(u):
-                self.ship.upgrade()
-                self.upgrades.remove(u)
+            if u.active:
+                u.game_logic()
+                if ship.active and ship.intersects(u):
+                    ship.upgrade()
+                    u.active = False
+                    self._free_upgrades.append(u)
 
         # Asteroids:
         if self.asteroid_count > 0:
-            for a in self.asteroids:
-                if a.active:
-                    a.game_logic(keys, new_keys)
-                    a.boundary_check(self.width, self.height)
-                    if self.ship.active and self.ship.intersects(a):
-                        self.ship.take_damage()
-                        self.destroy_asteroid(a)
-                    else:
-                        for b in self.bullets:
-                            if b.intersects(a):
-                                self.bullets.remove(b)
-                                self.destroy_asteroid(a)
-                                break
+            # (Snapshots are taken because destroying objects below reorders
+            # the active lists, while the arrays are indexed by snapshot.)
+            asteroids = self._active_asteroids[:]
+
+            # Move and wrap each asteroid, record its collision row, and bucket
+            # it by grid cell in a single pass, reading its position only
+            # once. (This inlines 'Asteroid.game_logic' and
+            # 'Shape.boundary_check'.)
+            grid = self._grid
+            grid.clear()
+            insert = grid.insert
+            rows = []
+            for (i, a) in enumerate(asteroids):
+                position = a.position
+                x = (position.x + a.dx) % width
+                y = (position.y + a.dy) % height
+                # ('%' can round a tiny negative value up to the screen size.)
+                if x >= width:
+                    x -= width
+                if y >= height:
+                    y -= height
+                (position.x, position.y) = (x, y)
+                a.transform_generation += 1
+                rows.append((x, y, a.radius, a.ship_reach_sq))
+                insert(i, x, y, a.radius)
+            self._ast_rows = self._fill_rows(self._ast_rows, rows)
+            bullets = active_bullets[:]
+            ast = self._ast_rows[:len(asteroids)]
+            bul = self._bul_pos[:len(bullets)].copy()
+            candidates = self._candidates
+
+            # Ship vs. nearby asteroids (found via the ship's bounding box,
+            # then checked by bounding circles, then exact shapes):
+            if ship.active:
+                (ship_x, ship_y) = (ship.position.x, ship.position.y)
+                del candidates[:]
+                grid.query_aabb(ship.get_aabb(), candidates)
+                if candidates:
+                    near = ast[candidates]
+                    dx = near[:, 0] - ship_x
+                    dy = near[:, 1] - ship_y
+                    for i in np.flatnonzero(dx * dx + dy * dy <= near[:, 3]):
+                        a = asteroids[candidates[i]]
+                        if ship.active and a.active and ship.intersects(a):
+                            ship.take_damage()
+                            destroy_asteroid(a)
+
+            # Bullets vs. nearby asteroids, with all candidate pairs checked
+            # in a single vectorized bounding-circle test, and the remaining
+            # pairs checked against the asteroids' exact outlines in another:
+            del candidates[:]
+            pair_bullets = self._pair_bullets
+            del pair_bullets[:]
+            # (The constant and bound methods are held in locals because this
+            # loop runs once per bullet.)
+            (query, bullet_radius) = (grid.query, BULLET_RADIUS)
+            bullet_positions = bul.tolist()
+            for (i, (x, y)) in enumerate(bullet_positions):
+                n = len(candidates)
+                query(x, y, bullet_radius, candidates)
+                pair_bullets.extend([i] * (len(candidates) - n))
+            if candidates:
+                b_xy = bul[pair_bullets]
+                a_xyr = ast[candidates]
+                dx = b_xy[:, 0] - a_xyr[:, 0]
+                dy = b_xy[:, 1] - a_xyr[:, 1]
+                r = BULLET_RADIUS + a_xyr[:, 2]
+                near = np.flatnonzero(dx * dx + dy * dy <= r * r)
+                if len(near) > 0:
+                    pair_asteroids = np.asarray(candidates)[near]
+                    (xs, ys) = self._outline_rows(asteroids, pair_asteroids)
+                    hits = kernels.collide_bullets_asteroids(
+                        b_xy[near], BULLET_RADIUS, xs, ys)
+                    for k in near[hits].tolist():
+                        (b, a) = (bullets[pair_bullets[k]],
+                                  asteroids[candidates[k]])
+                        if b.active and a.active:
+                            deactivate(b, active_bullets, free_bullets,
+                                       bullet_arrays)
+                            destroy_asteroid(a)
         elif self.asteroid_respawn_timer > 0:
             self.asteroid_respawn_timer -= 1
         else:
             self.spawn_asteroids()
 
         # Stars:
-        for s in self.stars:
-            s.twinkle()
+        kernels.twinkle_stars(self._star_brightness, self._star_twinkle_rates)
 
     #---------------------------------------------------------------------------
     #      Method: paint
@@ -152,15 +296,18 @@ class AsteroidsGame(game.Game):
     #---------------------------------------------------------------------------
     def paint(self, surface):
         surface.fill(BACKGROUND_COLOR)
-        for s in self.stars:
-            s.paint(surface)
+        sprites = self._star_sprites
+        surface.blits([(sprites[b], p) for (b, p) in
+                       zip(self._star_brightness.tolist(),
+                           self._star_blit_positions)], False)
         for u in self.upgrades:
             u.paint(surface)
         self.ship.paint(surface)
-        for b in self.bullets:
-            b.paint(surface)
-        for a in self.asteroids:
-            a.paint(surface)
+        sprite = self._bullet_sprite
+        positions = self._bul_pos[:len(self._active_bullets)]
+        corners = np.rint(positions).astype(int) - self._bullet_radius
+        surface.blits([(sprite, c) for c in corners.tolist()], False)
+        surface.blits([a.get_sprite() for a in self._active_asteroids], False)
 
     #---------------------------------------------------------------------------
     #      Method: spawn_asteroids
@@ -173,13 +320,12 @@ class AsteroidsGame(game.Game):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def spawn_asteroids(self):
+        # (New sets only spawn once every asteroid has been destroyed, so the
+        # whole pool is already inactive and queued for reuse.)
         self.asteroid_count = int(self.width * ASTEROID_DENSITY)
-        while len(self.asteroids):
-            self.asteroids.pop()
         self.ship.invincibility_timer = VULNERABILITY_DELAY
-        while len(self.asteroids) < self.asteroid_count:
-            self.asteroids.append(shapes.Asteroid(ASTEROID_MAX_RADIUS,
-                                                  self.get_random_point()))
+        for p in self.get_random_points(self.asteroid_count):
+            self._spawn_asteroid(ASTEROID_MAX_RADIUS, p)
         self.asteroid_respawn_timer = 0
 
     #---------------------------------------------------------------------------
@@ -194,34 +340,170 @@ class AsteroidsGame(game.Game):
     #     Outputs: None.
     #---------------------------------------------------------------------------
     def destroy_asteroid(self, asteroid):
-            asteroid.active = False
+            self._deactivate(asteroid, self._active_asteroids,
+                             self._free_asteroids)
             self.ship.asteroids_destroyed += 1
             if self.ship.asteroids_destroyed % UPGRADE_REQ == 0:
-                self.upgrades.append(shapes.Upgrade(asteroid.position))
+                # (The pool grows if every upgrade is already on screen, so
+                # none are ever dropped.)
+                if not self._free_upgrades:
+                    upgrade = shapes.Upgrade(asteroid.position)
+                    self.upgrades.append(upgrade)
+                    self._free_upgrades.append(upgrade)
+                self._free_upgrades.popleft().spawn(asteroid.position)
             half_radius = asteroid.average_radius // 2
             self.asteroid_count -= 1
             if half_radius >= ASTEROID_MIN_RADIUS:
-                self.asteroids.append(shapes.Asteroid(half_radius,
-                                                      asteroid.position))
-                self.asteroids.append(shapes.Asteroid(half_radius,
-                                                      asteroid.position))
+                self._spawn_asteroid(half_radius, asteroid.position)
+                self._spawn_asteroid(half_radius, asteroid.position)
                 self.asteroid_count += 2
             elif self.asteroid_count <= 0:
                 self.asteroid_respawn_timer = RESPAWN_DELAY
 
     #---------------------------------------------------------------------------
-    #      Method: get_random_point
+    #      Method: get_random_points
     #
-    # Description: Generates a random spawn point (for a star or asteroid).
+    # Description: Generates random spawn points (for stars or asteroids), all
+    #              drawn from the random number generator in a single batch.
     #
-    #      Inputs: None.
+    #      Inputs: count - Number of points to generate.
+    #
+    #     Outputs: List containing the random points.
+    #---------------------------------------------------------------------------
+    def get_random_points(self, count):
+        coordinates = self._rng.integers(0, (self.width - 1, self.height - 1),
+                                         size=(count, 2))
+        return [shapes.Point(x, y) for (x, y) in coordinates.tolist()]
+
+    #---------------------------------------------------------------------------
+    #      Method: _fill_rows
+    #
+    # Description: Copies the given rows into the start of a float array,
+    #              allocating a larger array first if needed.
+    #
+    #      Inputs: array - The array to fill (reused between frames).
+    #              rows  - List of equal-length tuples to copy.
+    #
+    #     Outputs: The filled array, which may be a newly allocated one.
+    #---------------------------------------------------------------------------
+    def _fill_rows(self, array, rows):
+        if len(array) < len(rows):
+            array = np.empty((2 * len(rows), array.shape[1]), dtype=array.dtype)
+        if rows:
+            array[:len(rows)] = rows
+        return array
+
+    #---------------------------------------------------------------------------
+    #      Method: _outline_rows
+    #
+    # Description: Stacks the current outlines of the given asteroids into
+    #              arrays for 'kernels.collide_bullets_asteroids', padding
+    #              each row to ASTEROID_MAX_POINTS by repeating its first
+    #              vertex. Each asteroid is transformed only once, however
+    #              many times it appears.
+    #
+    #      Inputs: asteroids - List of asteroids.
+    #              indices   - Array of indices into 'asteroids', one per row.
+    #
+    #     Outputs: Arrays of x and y vertex coordinates, one row per index.
+    #---------------------------------------------------------------------------
+    def _outline_rows(self, asteroids, indices):
+        (unique, rows) = np.unique(indices, return_inverse=True)
+        xs = np.empty((len(unique), ASTEROID_MAX_POINTS))
+        ys = np.empty((len(unique), ASTEROID_MAX_POINTS))
+        for (row, j) in enumerate(unique.tolist()):
+            (outline_x, outline_y) = asteroids[j].get_points()
+            n = len(outline_x)
+            (xs[row, :n], xs[row, n:]) = (outline_x, outline_x[0])
+            (ys[row, :n], ys[row, n:]) = (outline_y, outline_y[0])
+        return (xs[rows], ys[rows])
+
+    #---------------------------------------------------------------------------
+    #      Method: _fire
+    #
+    # Description: Fires a bullet from the pool, first doubling the pool (and
+    #              the bullet arrays) if every bullet is already in flight.
+    #
+    #      Inputs: position - Starting point of the bullet.
+    #              rotation - Direction of travel, in degrees.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _fire(self, position, rotation):
+        if not self._free_bullets:
+            bullets = [shapes.Bullet(position, 0)
+                       for i in range(len(self.bullets))]
+            for b in bullets:
+                b.active = False
+            self.bullets.extend(bullets)
+            self._free_bullets.extend(bullets)
+            self._bul_pos = np.concatenate((self._bul_pos,
+                                            np.empty_like(self._bul_pos)))
+            self._bul_vel = np.concatenate((self._bul_vel,
+                                            np.empty_like(self._bul_vel)))
+        bullet = self._free_bullets.popleft()
+        bullet.fire(position, rotation)
+        self._activate(bullet, self._active_bullets)
+        self._bul_pos[bullet.active_index] = (position.x, position.y)
+        self._bul_vel[bullet.active_index] = (bullet.dx, bullet.dy)
+
+    #---------------------------------------------------------------------------
+    #      Method: _spawn_asteroid
+    #
+    # Description: Reinitializes an inactive asteroid from the pool.
+    #
+    #      Inputs: radius   - Average radius of the new asteroid.
+    #              position - Spawn point of the new asteroid.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _spawn_asteroid(self, radius, position):
+        asteroid = self._free_asteroids.popleft()
+        asteroid.spawn(radius, position)
+        asteroid.ship_reach_sq = (asteroid.radius + self.ship.radius) ** 2
+        self._activate(asteroid, self._active_asteroids)
+
+    #---------------------------------------------------------------------------
+    #      Method: _activate
+    #
+    # Description: Marks a pooled object as active and adds it to the given list
+    #              of active objects, so that per-frame loops never need to
+    #              visit (and skip) inactive ones.
     #
-    #     Outputs: Tuple containing the random coordinates.
+    #      Inputs: obj    - The object to activate.
+    #              active - List of active objects of the same kind.
+    #
+    #     Outputs: None.
+    #---------------------------------------------------------------------------
+    def _activate(self, obj, active):
+        obj.active = True
+        obj.active_index = len(active)
+        active.append(obj)
+
+    #---------------------------------------------------------------------------
+    #      Method: _deactivate
+    #
+    # Description: Marks a pooled object as inactive, removes it from the given
+    #              list of active objects (by moving the last active object into
+    #              its slot), and queues it for reuse.
+    #
+    #      Inputs: obj    - The object to deactivate.
+    #              active - List of active objects of the same kind.
+    #              free   - Queue of inactive objects of the same kind.
+    #              arrays - Arrays whose rows parallel the active list, to be
+    #                       kept in step with it (optional).
+    #
+    #     Outputs: None.
     #---------------------------------------------------------------------------
-    def get_random_point(self):
-        random_point = shapes.Point(int(random.uniform(0, self.width - 1)),
-                                    int(random.uniform(0, self.height - 1)))
-        return random_point
+    def _deactivate(self, obj, active, free, arrays=()):
+        obj.active = False
+        last = active.pop()
+        if last is not obj:
+            active[obj.active_index] = last
+            for array in arrays:
+                array[obj.active_index] = array[last.active_index]
+            last.active_index = obj.active_index
+        free.append(obj)
 
 def main():
     game = AsteroidsGame()
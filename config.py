@@ -38,14 +38,20 @@ ASTEROID_MIN_SPEED = 1.0
 ASTEROID_MAX_SPEED = 4.0
 ASTEROID_MIN_ROTATION_SPEED = 1.0
 ASTEROID_MAX_ROTATION_SPEED = 6.0
+ASTEROID_SPRITE_ROTATIONS = 32 # number of distinct angles an asteroid may have
+ASTEROID_OUTLINES = 8 # number of distinct outlines per asteroid size
+
+SPATIAL_HASH_CELL_SIZE = 2 * ASTEROID_MAX_RADIUS
 
 BULLET_RADIUS = 3.0
 BULLET_COLOR = (255, 255, 0)
 BULLET_SPEED = 30.0
+MAX_BULLETS = 256 # initial size of the reusable bullet pool
 
 UPGRADE_RADIUS = 7.0
 UPGRADE_REQ = 15 # number of asteroids to destroy to earn upgrade
 MAX_UPGRADE_LEVEL = 7
+MAX_UPGRADES = 16 # initial size of the reusable upgrade pool
 
 STAR_DENSITY = 0.1
 STAR_RADIUS = 2
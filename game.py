@@ -51,7 +51,10 @@ class Game:
     #---------------------------------------------------------------------------
     #      Method: paint
     #
-    # Description: Virtual method intended to draw images to the screen.
+    # Description: Virtual method intended to draw images to the screen. The
+    #              whole surface must be redrawn each time, since 'main_loop'
+    #              presents each frame with a single full-screen 'flip' rather
+    #              than updating a list of dirty rectangles.
     #
     #      Inputs: surface - The surface on which to draw.
     #
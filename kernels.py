@@ -0,0 +1,199 @@
+#-------------------------------------------------------------------------------
+#    Filename: kernels.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains array-based update and geometry functions for an
+#              Asteroids game. They are compiled with Numba when it is
+#              installed, and run as plain NumPy code otherwise.
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+#-------------------------------------------------------------------------------
+#   Decorator: _compiled
+#
+# Description: Compiles a function with Numba if available (caching the result
+#              on disk to avoid recompiling on every launch).
+#
+#      Inputs: function - The function to compile.
+#
+#     Outputs: The compiled function, or the original one.
+#-------------------------------------------------------------------------------
+def _compiled(function):
+    if njit is None:
+        return function
+    return njit(cache=True)(function)
+
+#-------------------------------------------------------------------------------
+#   Decorator: _compiled_or
+#
+# Description: Compiles a loop-based function with Numba if available, or
+#              otherwise substitutes an equivalent NumPy function (since plain
+#              Python loops would be far slower than array operations).
+#
+#      Inputs: fallback - The NumPy function to use without Numba.
+#
+#     Outputs: A decorator returning the compiled function or the fallback.
+#-------------------------------------------------------------------------------
+def _compiled_or(fallback):
+    def decorator(function):
+        if njit is None:
+            return fallback
+        return njit(cache=True)(function)
+    return decorator
+
+#-------------------------------------------------------------------------------
+#    Function: twinkle_stars
+#
+# Description: Advances the brightness of every star by its twinkle rate,
+#              reversing the rate of any star that would leave the 0-255 range.
+#
+#      Inputs: brightness - Array of star brightness values (updated in place).
+#              rates      - Array of twinkle rates (updated in place).
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+@_compiled
+def twinkle_stars(brightness, rates):
+    next_brightness = brightness + rates
+    out_of_range = (next_brightness > 255) | (next_brightness < 0)
+    rates[:] = np.where(out_of_range, -rates, rates)
+    brightness += rates
+
+def _points_in_polygon_arrays(xs, ys, next_xs, slopes, points_x, points_y):
+    x = points_x[:, None]
+    y = points_y[:, None]
+    spans = (((xs < x) & (x <= next_xs)) | ((next_xs < x) & (x <= xs)))
+    with np.errstate(invalid='ignore'):
+        crossings = spans & (y > ys + slopes * (x - xs))
+    return crossings.sum(axis=1) % 2 == 1
+
+#-------------------------------------------------------------------------------
+#    Function: points_in_polygon
+#
+# Description: Runs the crossing-number test for each of an array of points:
+#              a point's vertical ray is checked against every edge whose x
+#              range it falls within, and an odd number of crossings means
+#              the point is inside the polygon.
+#
+#      Inputs: xs, ys   - Arrays of the polygon's vertex coordinates.
+#              next_xs  - Array of each edge's far x coordinate.
+#              slopes   - Array of each edge's slope.
+#              points_x - Array of the points' x coordinates.
+#              points_y - Array of the points' y coordinates.
+#
+#     Outputs: A boolean array, True for each point inside the polygon.
+#-------------------------------------------------------------------------------
+@_compiled_or(_points_in_polygon_arrays)
+def points_in_polygon(xs, ys, next_xs, slopes, points_x, points_y):
+    inside = np.zeros(points_x.shape[0], dtype=np.bool_)
+    for i in range(points_x.shape[0]):
+        (x, y) = (points_x[i], points_y[i])
+        crossings = 0
+        for j in range(xs.shape[0]):
+            if ((xs[j] < x and x <= next_xs[j]) or
+                    (next_xs[j] < x and x <= xs[j])):
+                if y > ys[j] + slopes[j] * (x - xs[j]):
+                    crossings += 1
+        inside[i] = crossings % 2 == 1
+    return inside
+
+def _project_points_arrays(xs, ys, axes_x, axes_y):
+    projections = np.outer(axes_x, xs) + np.outer(axes_y, ys)
+    return (projections.min(axis=1), projections.max(axis=1))
+
+#-------------------------------------------------------------------------------
+#    Function: project_points
+#
+# Description: Projects a set of points onto each of an array of axes (as
+#              used in separating axis tests).
+#
+#      Inputs: xs, ys         - Arrays of the points' coordinates.
+#              axes_x, axes_y - Arrays of the axes' x and y components.
+#
+#     Outputs: Arrays of the minimum and maximum projections onto each axis.
+#-------------------------------------------------------------------------------
+@_compiled_or(_project_points_arrays)
+def project_points(xs, ys, axes_x, axes_y):
+    mins = np.empty(axes_x.shape[0])
+    maxes = np.empty(axes_x.shape[0])
+    for i in range(axes_x.shape[0]):
+        low = high = xs[0] * axes_x[i] + ys[0] * axes_y[i]
+        for j in range(1, xs.shape[0]):
+            projection = xs[j] * axes_x[i] + ys[j] * axes_y[i]
+            if projection < low:
+                low = projection
+            elif projection > high:
+                high = projection
+        (mins[i], maxes[i]) = (low, high)
+    return (mins, maxes)
+
+#-------------------------------------------------------------------------------
+#    Function: collide_bullets_asteroids
+#
+# Description: Tests each of an array of bullet/asteroid pairs for a
+#              collision at once. A bullet hits an asteroid if its center is
+#              inside the asteroid's outline (by the crossing-number test) or
+#              within one radius of any of its edges.
+#
+#      Inputs: centers - Array of bullet centers, one (x, y) row per pair.
+#              radius  - Radius of every bullet.
+#              xs, ys  - Arrays of asteroid vertex coordinates, one row per
+#                        pair. Rows are padded to a common length by repeating
+#                        the first vertex, which only adds zero-length edges.
+#
+#     Outputs: A boolean array, True for each colliding pair.
+#-------------------------------------------------------------------------------
+@_compiled
+def collide_bullets_asteroids(centers, radius, xs, ys):
+    x = centers[:, 0:1]
+    y = centers[:, 1:2]
+    next_xs = np.concatenate((xs[:, 1:], xs[:, :1]), axis=1)
+    next_ys = np.concatenate((ys[:, 1:], ys[:, :1]), axis=1)
+    (edges_x, edges_y) = (next_xs - xs, next_ys - ys)
+    (offsets_x, offsets_y) = (x - xs, y - ys)
+
+    # Crossing-number test (written without division, so it needs no special
+    # handling of vertical or zero-length edges):
+    spans = (((xs < x) & (x <= next_xs)) | ((next_xs < x) & (x <= xs)))
+    above = (offsets_y * edges_x - edges_y * offsets_x) * edges_x > 0
+    inside = (spans & above).sum(axis=1) % 2 == 1
+
+    # Distance from each center to the nearest point of each edge:
+    lengths_squared = np.maximum(edges_x * edges_x + edges_y * edges_y, 1e-12)
+    t = (offsets_x * edges_x + offsets_y * edges_y) / lengths_squared
+    t = np.minimum(np.maximum(t, 0.0), 1.0)
+    (gaps_x, gaps_y) = (offsets_x - t * edges_x, offsets_y - t * edges_y)
+    touching = (gaps_x * gaps_x + gaps_y * gaps_y <= radius * radius)
+    return inside | (touching.sum(axis=1) > 0)
+
+#-------------------------------------------------------------------------------
+#    Function: warm_up
+#
+# Description: Calls each function once with small arrays of the types used
+#              in the game, so any Numba compilation happens before play
+#              begins rather than during the first collision.
+#
+#      Inputs: None.
+#
+#     Outputs: None.
+#-------------------------------------------------------------------------------
+def warm_up():
+    xs = np.array([0.0, 2.0, 0.0], dtype=np.float32)
+    ys = np.array([0.0, 1.0, 2.0], dtype=np.float32)
+    next_xs = np.array([2.0, 0.0, 0.0], dtype=np.float32)
+    slopes = np.array([0.5, -0.5, np.inf], dtype=np.float32)
+    points = np.ones(1)
+    points_in_polygon(xs, ys, next_xs, slopes, points, points)
+    project_points(xs, ys, xs, ys)
+    project_points(xs, ys, points, points)
+    collide_bullets_asteroids(np.ones((1, 2), dtype=np.float32), 1.0,
+                              xs[None, :].astype(float),
+                              ys[None, :].astype(float))
+    twinkle_stars(np.zeros(1, dtype=np.int32), np.ones(1, dtype=np.int32))
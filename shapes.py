@@ -5,34 +5,62 @@
 #
 # Description: Contains shape-related classes for use in an Asteroids game,
 #              including 'Shape' (abstract), 'Polygon', 'Circle', 'Ship',
-#              'Asteroid', 'Bullet', 'Star', 'Upgrade', and 'Point'.
+#              'Asteroid', 'Bullet', 'Star', 'Upgrade', and 'Point', as well as
+#              a 'circle_sprite' function for pre-rendering circles.
 #-------------------------------------------------------------------------------
 
 import math
 import random
+import numpy as np
 import pygame
 from pygame import draw
+import kernels
 from config import *
 
+_rng = np.random.default_rng() # for generating arrays of random values
+_asteroid_outlines = {} # shared asteroid outlines, keyed by average radius
+
 #-------------------------------------------------------------------------------
 #       Class: Shape
 #
 # Description: Abstract class for handling shapes as Asteroids game objects.
 #
-#     Methods: __init__, game_logic (virtual), paint (virtual), get_points
-#              (virtual), contains (virtual), move, boundary_check, rotate,
-#              accelerate, intersects, set_random_color, set_random_rotation,
-#              set_random_rotation_rate, set_random_acceleration
+#     Methods: __init__, rotation (property), game_logic (virtual), paint
+#              (virtual), get_points (virtual), get_aabb (virtual), contains
+#              (virtual), move, boundary_check, rotate, accelerate,
+#              intersects, set_random_color, set_random_rotation,
+#              set_random_rotation_rate, set_random_acceleration,
+#              _aabb_overlaps, _get_axes (virtual), _project (virtual),
+#              _has_separating_axis
+#
+#       Notes: Anything that moves or rotates a shape must increment its
+#              'transform_generation', which keys cached transformations.
 #-------------------------------------------------------------------------------
 class Shape:
+    transform_generation = 0
+
     def __init__(self, position, rotation, color):
-        self.position = position
+        self.position = position.copy()
         self.rotation = rotation
         self.color = color
         self.dx = 0
         self.dy = 0
         self.active = True
 
+    @property
+    def rotation(self):
+        return self._rotation
+
+    # Caches the rotation's cosine and sine whenever the rotation changes, so
+    # 'accelerate' and 'get_points' needn't recompute them.
+    @rotation.setter
+    def rotation(self, degrees):
+        self._rotation = degrees
+        self.transform_generation += 1
+        radians = math.radians(degrees)
+        self._rot_cos = math.cos(radians)
+        self._rot_sin = math.sin(radians)
+
     def game_logic(self, keys, new_keys):
         raise NotImplementedError()
 
@@ -42,46 +70,70 @@ class Shape:
     def get_points(self):
         raise NotImplementedError()
 
-    def contains(self, point):
+    # Returns the shape's axis-aligned bounding box as (min_x, max_x, min_y,
+    # max_y).
+    def get_aabb(self):
         raise NotImplementedError()
 
-    def move(self):
-        self.position = Point(self.position.x + self.dx,
-                              self.position.y + self.dy)
+    def contains(self, x, y):
+        raise NotImplementedError()
 
+    def move(self):
+        if self.dx or self.dy:
+            position = self.position
+            position.x += self.dx
+            position.y += self.dy
+            self.transform_generation += 1
+
+    # Wraps the shape around to the opposite side of the screen once it goes
+    # past an edge (keeping however far past the edge it went). A tiny
+    # negative coordinate rounds to exactly the screen size under '%', so
+    # that case is wrapped to 0 as well.
     def boundary_check(self, screen_width, screen_height):
-        if self.position.x >= screen_width:
-            self.position = Point(0, self.position.y)
-        elif self.position.x < 0:
-            self.position = Point(screen_width - 1, self.position.y)
-        if self.position.y >= screen_height:
-            self.position = Point(self.position.x, 0)
-        elif self.position.y < 0:
-            self.position = Point(self.position.x, screen_height)
+        position = self.position
+        (x, y) = (position.x % screen_width, position.y % screen_height)
+        if x >= screen_width:
+            x -= screen_width
+        if y >= screen_height:
+            y -= screen_height
+        if x != position.x or y != position.y:
+            (position.x, position.y) = (x, y)
+            self.transform_generation += 1
 
     def rotate(self, degrees):
-        self.rotation += degrees
-        if self.rotation < 0.0:
-            self.rotation += 360.0
-        elif self.rotation >= 360.0:
-            self.rotation -= 360.0
+        rotation = self.rotation + degrees
+        if rotation < 0.0:
+            rotation += 360.0
+        elif rotation >= 360.0:
+            rotation -= 360.0
+        self.rotation = rotation
 
     def accelerate(self, acceleration):
-        self.dx = self.dx + acceleration * math.cos(math.radians(self.rotation))
-        self.dy = self.dy + acceleration * math.sin(math.radians(self.rotation))
+        self.dx = self.dx + acceleration * self._rot_cos
+        self.dy = self.dy + acceleration * self._rot_sin
 
+    # Determines whether two shapes intersect. Bounding boxes and separating
+    # axes rule out most pairs; if both shapes are convex, finding no
+    # separating axis proves they intersect. Otherwise, fall back to checking
+    # whether any point of either shape lies inside the other.
     def intersects(self, other_shape):
-        for point in self.get_points():
-            if other_shape.contains(point):
-                return True
-        for point in other_shape.get_points():
-            if self.contains(point):
-                return True
-        return False
-
+        if not self._aabb_overlaps(other_shape):
+            return False
+        if (self._has_separating_axis(other_shape) or
+                other_shape._has_separating_axis(self)):
+            return False
+        if self.convex and other_shape.convex:
+            return True
+        (xs, ys) = self.get_points()
+        if other_shape.contains(xs, ys).any():
+            return True
+        (xs, ys) = other_shape.get_points()
+        return bool(self.contains(xs, ys).any())
+
+    # Picks all three channels from a single 24-bit random number.
     def set_random_color(self):
-        self.color = (random.randint(0, 255), random.randint(0, 255),
-                      random.randint(0, 255))
+        bits = random.getrandbits(24)
+        self.color = (bits >> 16, (bits >> 8) & 0xFF, bits & 0xFF)
 
     def set_random_rotation(self, min=0.0, max=359.99):
         self.rotation = random.uniform(min, max)
@@ -94,95 +146,203 @@ class Shape:
     def set_random_acceleration(self, min, max):
         self.acceleration = int(random.uniform(min, max))
 
+    # Cheaply rules out most non-intersecting pairs before any point tests.
+    def _aabb_overlaps(self, other_shape):
+        (min_x, max_x, min_y, max_y) = self.get_aabb()
+        (other_min_x, other_max_x, other_min_y,
+         other_max_y) = other_shape.get_aabb()
+        return not (max_x < other_min_x or other_max_x < min_x or
+                    max_y < other_min_y or other_max_y < min_y)
+
+    # Returns arrays of the x and y components of the unit axes this shape
+    # contributes to a separating axis test against another shape.
+    def _get_axes(self, other_shape):
+        raise NotImplementedError()
+
+    # Returns arrays of the shape's minimum and maximum projections onto each
+    # of the given unit axes.
+    def _project(self, axes_x, axes_y):
+        raise NotImplementedError()
+
+    # Determines whether the shapes' projections fail to overlap on any of
+    # this shape's axes (which means the shapes cannot intersect).
+    def _has_separating_axis(self, other_shape):
+        (axes_x, axes_y) = self._get_axes(other_shape)
+        (mins, maxes) = self._project(axes_x, axes_y)
+        (other_mins, other_maxes) = other_shape._project(axes_x, axes_y)
+        return bool(((maxes < other_mins) | (other_maxes < mins)).any())
+
+#-------------------------------------------------------------------------------
+#       Class: Outline
+#
+# Description: Holds a polygon's shape, centered on its center of gravity,
+#              along with the properties derived from it. A shape is given as
+#              a pair of x and y coordinate arrays. Outlines never change, so
+#              polygons with the same shape can share one.
+#
+#     Methods: __init__, _is_convex, _find_center
+#-------------------------------------------------------------------------------
+class Outline:
+    def __init__(self, shape):
+        # Orient all points relative to the shape's origin (its top-most,
+        # left-most pixel):
+        xs = np.asarray(shape[0], dtype=np.float64)
+        ys = np.asarray(shape[1], dtype=np.float64)
+        (xs, ys) = (xs - xs.min(), ys - ys.min())
+
+        # Now shift all points based on the center of gravity:
+        self.center = self._find_center(xs, ys)
+        self.shape_x = (xs - self.center.x).astype(np.float32)
+        self.shape_y = (ys - self.center.y).astype(np.float32)
+
+        # Find the bounding radius (used for broad-phase collision checks):
+        self.radius = float(np.hypot(self.shape_x, self.shape_y).max())
+        self.convex = self._is_convex()
+
+        # Find the unit normal of each edge in the shape's own frame (these
+        # only need rotating, since the shape is rigid):
+        normals_x = self.shape_y - np.roll(self.shape_y, -1)
+        normals_y = np.roll(self.shape_x, -1) - self.shape_x
+        lengths = np.hypot(normals_x, normals_y)
+        (self.shape_normals_x, self.shape_normals_y) = (normals_x / lengths,
+                                                        normals_y / lengths)
+
+        # Pre-rendered images of the outline, keyed by (color, rotation) pairs
+        # (see 'Asteroid'):
+        self.sprites = {}
+
+    # Determines whether the outline is convex, i.e., whether every turn from
+    # one edge to the next is in the same direction.
+    def _is_convex(self):
+        (xs, ys) = (self.shape_x, self.shape_y)
+        (edges_x, edges_y) = (np.roll(xs, -1) - xs, np.roll(ys, -1) - ys)
+        turns = edges_x * np.roll(edges_y, -1) - edges_y * np.roll(edges_x, -1)
+        return bool((turns >= 0).all() or (turns <= 0).all())
+
+    # Finds the center of gravity with the shoelace formula, computing each
+    # edge's cross product once for both the area and the centroid.
+    def _find_center(self, xs, ys):
+        (next_xs, next_ys) = (np.roll(xs, -1), np.roll(ys, -1))
+        cross = xs * next_ys - next_xs * ys
+        area = abs(0.5 * cross.sum())
+        center_x = abs(((xs + next_xs) * cross).sum() / (6.0 * area))
+        center_y = abs(((ys + next_ys) * cross).sum() / (6.0 * area))
+        return Point(center_x, center_y)
+
 #-------------------------------------------------------------------------------
 #       Class: Polygon
 #
-# Description: Superclass for all polygonal Asteroids game objects.
+# Description: Superclass for all polygonal Asteroids game objects. A shape
+#              is given as an 'Outline' (which may be shared) or as a pair of
+#              x and y coordinate arrays.
 #
-#     Methods: __init__, paint, get_points, contains, _find_area, _find_center
+#     Methods: __init__, paint, get_points, get_aabb, contains, _get_edges,
+#              _get_axes, _project, _edge_normals
 #-------------------------------------------------------------------------------
 class Polygon(Shape):
     def __init__(self, shape, position, rotation, color):
         Shape.__init__(self, position, rotation, color)
         self.cache_points = (None, None, None)
-
-        # Find the shape's origin (its top-most, left-most pixel):
-        (origin_x, origin_y) = (shape[0].x, shape[0].y)
-        for p in shape:
-            if p.x < origin_x:
-                origin_x = p.x
-            if p.y < origin_y:
-                origin_y = p.y
-
-        # Orient all points relative to the origin:
-        shifted = []
-        for p in shape:
-            shifted.append(Point(p.x - origin_x, p.y - origin_y))
-
-        # Now shift all points based on the center of gravity:
-        self.shape = shifted
-        self.center = self._find_center()
-        self.shape = []
-        for p in shifted:
-            self.shape.append(Point(p.x - self.center.x, p.y - self.center.y))
+        self.cache_edges = None
+        self.cache_normals = (None, None, None)
+        if not isinstance(shape, Outline):
+            shape = Outline(shape)
+        self.outline = shape
+        (self.shape_x, self.shape_y) = (shape.shape_x, shape.shape_y)
+        (self.shape_normals_x, self.shape_normals_y) = (shape.shape_normals_x,
+                                                        shape.shape_normals_y)
+        (self.center, self.radius) = (shape.center, shape.radius)
+        self.convex = shape.convex
+
+        # Pixel coordinates for drawing, overwritten in place whenever the
+        # polygon is painted after moving or rotating:
+        self.draw_buffer = [[0, 0] for i in range(len(self.shape_x))]
+        self.draw_generation = None
 
     def paint(self, surface):
         if not self.active:
             return
-        point_list = self.get_points()
-        converted_point_list = []
-        for point in point_list:
-            converted_point_list.append(point.pair())
-        draw.polygon(surface, self.color, converted_point_list)
-
-    # Applies rotation and offset to the shape of the polygon.
+        # Round the points to pixels only once per transformation:
+        if self.draw_generation != self.transform_generation:
+            (xs, ys) = self.get_points()
+            for (pair, x, y) in zip(self.draw_buffer,
+                                    np.rint(xs).astype(int).tolist(),
+                                    np.rint(ys).astype(int).tolist()):
+                pair[0] = x
+                pair[1] = y
+            self.draw_generation = self.transform_generation
+        draw.polygon(surface, self.color, self.draw_buffer)
+
+    # Applies rotation and offset to the shape of the polygon, returning arrays
+    # of the resulting x and y coordinates.
     def get_points(self):
-        (old_rotation, old_position, old_points) = self.cache_points
-        if old_rotation == self.rotation and old_position == self.position:
-            return old_points
-        angle = math.radians(self.rotation)
-        sin = math.sin(angle)
-        cos = math.cos(angle)
-        points = []
-        for p in self.shape:
-            x = p.x * cos - p.y * sin + self.position.x
-            y = p.x * sin + p.y * cos + self.position.y
-            points.append(Point(x, y))
-        self.cache_points = (self.rotation, self.position, points)
-        return points
-
-    # Determines whether a given point is inside the polygon.
-    def contains(self, point):
-        points = self.get_points()
-        crossing_number = 0
-        for i in range(len(points)):
-            j = (i + 1) % len(points)
-            if (((points[i].x < point.x and point.x <= points[j].x) or
-                 (points[j].x < point.x and point.x <= points[i].x)) and
-                (point.y > points[i].y + (points[j].y - points[i].y) /
-                 (points[j].x - points[i].x) * (point.x - points[i].x))):
-                crossing_number += 1
-        return crossing_number % 2 == 1
-
-    def _find_area(self):
-        shape = self.shape
-        sum = 0.0
-        for i in range(len(shape)):
-            j = (i + 1) % len(self.shape)
-            sum += shape[i].x * shape[j].y - shape[j].x * shape[i].y
-        return abs(0.5 * sum)
-
-    def _find_center(self):
-        shape = self.shape
-        (sum_x, sum_y) = (0.0, 0.0)
-        for i in range(len(shape)):
-            j = (i + 1) % len(self.shape)
-            sum_x += ((shape[i].x + shape[j].x) *
-                      (shape[i].x * shape[j].y - shape[j].x * shape[i].y))
-            sum_y += ((shape[i].y + shape[j].y) *
-                      (shape[i].x * shape[j].y - shape[j].x * shape[i].y))
-        area = self._find_area()
-        return Point(abs(sum_x / (6.0 * area)), abs(sum_y / (6.0 * area)))
+        (old_generation, old_xs, old_ys) = self.cache_points
+        if old_generation == self.transform_generation:
+            return (old_xs, old_ys)
+        (x, y) = (self.position.x, self.position.y)
+        (cos, sin) = (self._rot_cos, self._rot_sin)
+        xs = self.shape_x * cos - self.shape_y * sin + x
+        ys = self.shape_x * sin + self.shape_y * cos + y
+        self.cache_points = (self.transform_generation, xs, ys)
+        self.cache_aabb = (float(xs.min()), float(xs.max()),
+                           float(ys.min()), float(ys.max()))
+        self.cache_edges = None
+        return (xs, ys)
+
+    def get_aabb(self):
+        self.get_points()
+        return self.cache_aabb
+
+    # Determines whether the given point (or each of an array of points) is
+    # inside the polygon, using the crossing-number test in
+    # 'kernels.points_in_polygon'.
+    def contains(self, x, y):
+        (xs, ys) = self.get_points()
+        (next_xs, slopes) = self._get_edges()
+        shape = np.shape(x)
+        points_x = np.ravel(np.asarray(x, dtype=np.float64))
+        points_y = np.ravel(np.asarray(y, dtype=np.float64))
+        inside = kernels.points_in_polygon(xs, ys, next_xs, slopes, points_x,
+                                           points_y)
+        return inside.reshape(shape)
+
+    # Returns each edge's far x coordinate and slope (computed lazily, once
+    # per transformation). Vertical edges have infinite or undefined slopes,
+    # but are never spanned by a point in 'contains'.
+    def _get_edges(self):
+        (xs, ys) = self.get_points()
+        if self.cache_edges is None:
+            next_xs = np.concatenate((xs[1:], xs[:1]))
+            next_ys = np.concatenate((ys[1:], ys[:1]))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                slopes = (next_ys - ys) / (next_xs - xs)
+            self.cache_edges = (next_xs, slopes)
+        return self.cache_edges
+
+    def _get_axes(self, other_shape):
+        return self._edge_normals()
+
+    def _project(self, axes_x, axes_y):
+        (xs, ys) = self.get_points()
+        return kernels.project_points(xs, ys, axes_x, axes_y)
+
+    # Returns the unit normal of each edge, rotating the shape's normals only
+    # when its rotation has changed (moving doesn't affect them).
+    def _edge_normals(self):
+        (old_rotation, normals_x, normals_y) = self.cache_normals
+        if old_rotation != self.rotation:
+            (cos, sin) = (self._rot_cos, self._rot_sin)
+            (shape_x, shape_y) = (self.shape_normals_x, self.shape_normals_y)
+            normals_x = shape_x * cos - shape_y * sin
+            normals_y = shape_x * sin + shape_y * cos
+            self.cache_normals = (self.rotation, normals_x, normals_y)
+        return (normals_x, normals_y)
+
+# Keys controlling the ship (each set is checked with a single intersection):
+_FORWARD_KEYS = frozenset((pygame.K_UP, pygame.K_w, pygame.K_KP8))
+_BACKWARD_KEYS = frozenset((pygame.K_DOWN, pygame.K_s, pygame.K_KP2))
+_LEFT_KEYS = frozenset((pygame.K_LEFT, pygame.K_a, pygame.K_KP4))
+_RIGHT_KEYS = frozenset((pygame.K_RIGHT, pygame.K_d, pygame.K_KP6))
 
 #-------------------------------------------------------------------------------
 #       Class: Ship
@@ -193,11 +353,9 @@ class Polygon(Shape):
 #-------------------------------------------------------------------------------
 class Ship(Polygon):
     def __init__(self, position, rotation, color):
-        shape = []
-        for point in SHIP_POINTS:
-            shape.append(Point(point[0], point[1]))
+        shape = np.array(SHIP_POINTS, dtype=np.float64).T
         Polygon.__init__(self, shape, position, rotation, color)
-        self.starting_point = position
+        self.starting_point = position.copy()
         self.rotation_rate = SHIP_ROTATION_RATE
         self.acceleration_rate = SHIP_ACCELERATION_RATE
         self.asteroids_destroyed = 0
@@ -216,17 +374,13 @@ class Ship(Polygon):
             return
         if self.invincibility_timer > 0:
             self.invincibility_timer -= 1
-        if (pygame.K_UP in keys or pygame.K_w in keys or
-            pygame.K_KP8 in keys):
+        if not _FORWARD_KEYS.isdisjoint(keys):
             self.accelerate(self.acceleration_rate)
-        if (pygame.K_DOWN in keys or pygame.K_s in keys or
-            pygame.K_KP2 in keys):
+        if not _BACKWARD_KEYS.isdisjoint(keys):
             self.accelerate(self.acceleration_rate * -1)
-        if (pygame.K_LEFT in keys or pygame.K_a in keys or
-            pygame.K_KP4 in keys):
+        if not _LEFT_KEYS.isdisjoint(keys):
             self.rotate(self.rotation_rate * -1)
-        if (pygame.K_RIGHT in keys or pygame.K_d in keys or
-            pygame.K_KP6 in keys):
+        if not _RIGHT_KEYS.isdisjoint(keys):
             self.rotate(self.rotation_rate)
         if self.shielded:
             self.set_random_color()
@@ -254,67 +408,142 @@ class Ship(Polygon):
             self.active = False
             self.asteroids_destroyed = 0
             self.upgrade_level = 0
-            self.position = self.starting_point
+            self.position = self.starting_point.copy()
+            self.transform_generation += 1
             self.rotation = SHIP_INITIAL_ROTATION
             self.dx = 0
             self.dy = 0
             self.respawn_timer = RESPAWN_DELAY
 
+#-------------------------------------------------------------------------------
+#    Function: _asteroid_colors
+#
+# Description: Lists every color an asteroid can take: the base color with one
+#              channel raised or lowered by the deviation (or moved the other
+#              way, if that would leave the 0-255 range).
+#
+#      Inputs: None.
+#
+#     Outputs: A list of (r, g, b) tuples.
+#-------------------------------------------------------------------------------
+def _asteroid_colors():
+    base = np.array(ASTEROID_COLOR)
+    deviations = np.vstack((np.eye(3, dtype=int), -np.eye(3, dtype=int)))
+    deviations *= ASTEROID_COLOR_DEVIATION
+    colors = base + deviations
+    colors = np.where((colors < 0) | (colors > 255), base - deviations, colors)
+    return [tuple(color) for color in colors.tolist()]
+
+_ASTEROID_COLORS = _asteroid_colors()
+
 #-------------------------------------------------------------------------------
 #       Class: Asteroid
 #
-# Description: Manages asteroid behavior.
+# Description: Manages asteroid behavior. Asteroids of each size share a
+#              small set of outlines, which then vary by their (fixed)
+#              rotation and color, and share sprites rendered from them.
 #
-#     Methods: __init__, game_logic, _set_random_points
+#     Methods: __init__, spawn, game_logic, paint, get_sprite,
+#              _set_random_points, _render_sprite
 #-------------------------------------------------------------------------------
 class Asteroid(Polygon):
     def __init__(self, average_radius, spawn_point):
+        self.spawn(average_radius, spawn_point)
+
+    # (Re)initializes the asteroid with a new shape, color, and velocity, so
+    # that inactive asteroids can be reused rather than reallocated.
+    def spawn(self, average_radius, spawn_point):
         self.average_radius = average_radius
-        self._set_random_points(self.average_radius)
-        self.set_random_rotation()
+        outlines = _asteroid_outlines.get(average_radius)
+        if outlines is None:
+            outlines = [Outline(self._set_random_points(average_radius))
+                        for i in range(ASTEROID_OUTLINES)]
+            _asteroid_outlines[average_radius] = outlines
+        outline = random.choice(outlines)
+
+        # Asteroids never rotate, so each is given one of a fixed set of
+        # angles, letting it share sprites with others of the same outline:
+        rotations = ASTEROID_SPRITE_ROTATIONS
+        self.rotation = random.randrange(rotations) * 360.0 / rotations
         self.set_random_rotation_rate(ASTEROID_MIN_ROTATION_SPEED,
                                       ASTEROID_MAX_ROTATION_SPEED)
-        self.color = list(ASTEROID_COLOR)
-        index = random.randint(0, 2)
-        if random.randint(0, 1):
-            self.color[index] += ASTEROID_COLOR_DEVIATION
-            if self.color[index] > 255:
-                self.color[index] -= 2 * ASTEROID_COLOR_DEVIATION
-        else:
-            self.color[index] -= ASTEROID_COLOR_DEVIATION
-            if self.color[index] < 0:
-                self.color[index] += 2 * ASTEROID_COLOR_DEVIATION
-        self.color = tuple(self.color)
-        Polygon.__init__(self, self.shape, spawn_point, self.rotation,
-                         self.color)
+        self.color = random.choice(_ASTEROID_COLORS)
+        Polygon.__init__(self, outline, spawn_point, self.rotation, self.color)
         self.set_random_acceleration(ASTEROID_MIN_SPEED, ASTEROID_MAX_SPEED)
         self.accelerate(self.acceleration)
 
+        # The sprite is found (or rendered) when the asteroid is first drawn:
+        self._sprite = None
+        self._sprite_radius = int(math.ceil(self.radius)) + 1
+
     def game_logic(self, keys, new_keys):
         self.move()
 
+    def paint(self, surface):
+        if self.active:
+            surface.blit(*self.get_sprite())
+
+    # Returns a (sprite, position) pair for drawing the asteroid (individually
+    # or in a batched 'blits' call). Sprites are shared by all asteroids with
+    # the same outline, color, and rotation.
+    def get_sprite(self):
+        sprite = self._sprite
+        if sprite is None:
+            key = (self.color, self.rotation)
+            sprite = self.outline.sprites.get(key)
+            if sprite is None:
+                sprite = self._render_sprite()
+                self.outline.sprites[key] = sprite
+            self._sprite = sprite
+        (x, y) = self.position.pair()
+        radius = self._sprite_radius
+        return (sprite, (x - radius, y - radius))
+
+    # Returns a list of randomly placed points around a circle.
     def _set_random_points(self, average_radius):
-        self.shape = []
         points = random.randint(ASTEROID_MIN_POINTS, ASTEROID_MAX_POINTS)
         radius_deviation = average_radius // 4
-        for i in range(0, 360, 360 // points):
-            radius = random.randint(average_radius - radius_deviation,
-                                    average_radius + radius_deviation)
-            radians = math.radians(i)
-            self.shape.append(Point(math.cos(radians) * radius,
-                                    math.sin(radians) * radius))
+        angles = np.radians(np.arange(points) * (360.0 / points))
+        radii = _rng.integers(average_radius - radius_deviation,
+                              average_radius + radius_deviation,
+                              size=points, endpoint=True)
+        return (np.cos(angles) * radii, np.sin(angles) * radii)
+
+    # Rasterizes the asteroid at its rotation onto a color-keyed surface.
+    def _render_sprite(self):
+        radius = self._sprite_radius
+        (cos, sin) = (self._rot_cos, self._rot_sin)
+        xs = np.rint(self.shape_x * cos - self.shape_y * sin + radius)
+        ys = np.rint(self.shape_x * sin + self.shape_y * cos + radius)
+        points = list(zip(xs.astype(int).tolist(), ys.astype(int).tolist()))
+        sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1)).convert()
+        color_key = tuple(255 - c for c in self.color)
+        sprite.fill(color_key)
+        sprite.set_colorkey(color_key, pygame.RLEACCEL)
+        draw.polygon(sprite, self.color, points)
+        return sprite
 
 #-------------------------------------------------------------------------------
 #       Class: Circle
 #
 # Description: Superclass for all circular Asteroids game objects.
 #
-#     Methods: __init__, paint, get_points, contains
+#     Methods: __init__, paint, get_points, get_aabb, contains, _get_axes,
+#              _project
 #-------------------------------------------------------------------------------
 class Circle(Shape):
+    # Points on the unit circle used for collision detection (shared by all
+    # circles, which just scale and offset them):
+    _ANGLES = np.radians(np.arange(CIRCLE_POINT_COUNT) *
+                         (360.0 / CIRCLE_POINT_COUNT))
+    _UNIT_COS = np.cos(_ANGLES)
+    _UNIT_SIN = np.sin(_ANGLES)
+
     def __init__(self, position, radius, rotation, color):
         Shape.__init__(self, position, rotation, color)
         self.radius = radius
+        self.radius_squared = radius * radius
+        self.convex = True
 
     def paint(self, surface):
         if self.active:
@@ -322,47 +551,112 @@ class Circle(Shape):
                         int(self.radius))
 
     def get_points(self):
-        points = []
-        for i in range(0, 360, 360 // CIRCLE_POINT_COUNT):
-            radians = math.radians(i)
-            p = Point(math.cos(radians) * self.radius + self.position.x,
-                      math.sin(radians) * self.radius + self.position.y)
-            points.append(p)
-        return points
-
-    def contains(self, point):
-        distance_x = self.position.x - point.x
-        distance_y = self.position.y - point.y
+        return (Circle._UNIT_COS * self.radius + self.position.x,
+                Circle._UNIT_SIN * self.radius + self.position.y)
+
+    def get_aabb(self):
+        (x, y, r) = (self.position.x, self.position.y, self.radius)
+        return (x - r, x + r, y - r, y + r)
+
+    # Determines whether the given point (or each of an array of points) is
+    # inside the circle. A single point outside the circle's bounding box is
+    # rejected without any multiplication.
+    def contains(self, x, y):
+        distance_x = self.position.x - x
+        distance_y = self.position.y - y
+        if np.ndim(distance_x) == 0:
+            r = self.radius
+            if (distance_x > r or distance_x < -r or distance_y > r or
+                    distance_y < -r):
+                return False
         return ((distance_x * distance_x) + (distance_y * distance_y) <=
-                (self.radius * self.radius))
+                self.radius_squared)
+
+    # A circle's only useful axis runs from its center toward the other
+    # shape's nearest point (or the other circle's center).
+    def _get_axes(self, other_shape):
+        if isinstance(other_shape, Circle):
+            (xs, ys) = (other_shape.position.x, other_shape.position.y)
+        else:
+            (xs, ys) = other_shape.get_points()
+        distance_x = np.atleast_1d(xs - self.position.x)
+        distance_y = np.atleast_1d(ys - self.position.y)
+        distances = np.hypot(distance_x, distance_y)
+        nearest = distances.argmin()
+        if distances[nearest] == 0.0:
+            return (np.empty(0), np.empty(0))
+        return (distance_x[nearest:nearest + 1] / distances[nearest],
+                distance_y[nearest:nearest + 1] / distances[nearest])
+
+    def _project(self, axes_x, axes_y):
+        centers = axes_x * self.position.x + axes_y * self.position.y
+        return (centers - self.radius, centers + self.radius)
+
+#-------------------------------------------------------------------------------
+#    Function: circle_sprite
+#
+# Description: Renders a circle onto a small transparent surface, so that many
+#              identical circles can be drawn with a single batched 'blits'
+#              call. Blit the result at 'position.pair()' minus the (integer)
+#              radius, since blitting truncates any fractional position.
+#
+#      Inputs: color  - Color of the circle.
+#              radius - Radius of the circle.
+#
+#     Outputs: The rendered surface.
+#-------------------------------------------------------------------------------
+def circle_sprite(color, radius):
+    radius = int(radius)
+    sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+    draw.circle(sprite, color, (radius, radius), radius)
+    return sprite.convert_alpha()
 
 #-------------------------------------------------------------------------------
 #       Class: Bullet
 #
 # Description: Manages bullets from the player's ship.
 #
-#     Methods: __init__, game_logic
+#     Methods: __init__, fire, game_logic
+#
+#       Notes: 'AsteroidsGame' moves, draws, and tests bullets in batches via
+#              its position and velocity arrays, copying each new position
+#              back to its bullet so that 'position' is always current.
 #-------------------------------------------------------------------------------
 class Bullet(Circle):
     def __init__(self, position, rotation):
         Circle.__init__(self, position, BULLET_RADIUS, rotation, BULLET_COLOR)
         self.accelerate(BULLET_SPEED)
 
+    # Reactivates the bullet at a given position and heading.
+    def fire(self, position, rotation):
+        self.position = position.copy()
+        self.transform_generation += 1
+        self.rotation = rotation
+        self.dx = 0
+        self.dy = 0
+        self.accelerate(BULLET_SPEED)
+        self.active = True
+
     def game_logic(self, keys, new_keys):
-        self.position = Point(self.position.x + self.dx,
-                              self.position.y + self.dy)
+        self.move()
 
 #-------------------------------------------------------------------------------
 #       Class: Upgrade
 #
 # Description: Manages the visual appearance of upgrades (power-ups).
 #
-#     Methods: __init__, game_logic
+#     Methods: __init__, spawn, game_logic
 #-------------------------------------------------------------------------------
 class Upgrade(Circle):
     def __init__(self, position):
         Circle.__init__(self, position, UPGRADE_RADIUS, 0, (0, 0, 0))
 
+    # Reactivates the upgrade at a given position.
+    def spawn(self, position):
+        self.position = position.copy()
+        self.transform_generation += 1
+        self.active = True
+
     def game_logic(self):
         self.set_random_color()
 
@@ -371,7 +665,10 @@ class Upgrade(Circle):
 #
 # Description: Manages the appearance of distant stars.
 #
-#     Methods: __init__, twinkle
+#     Methods: __init__
+#
+#       Notes: Twinkling is handled for all stars at once by
+#              'kernels.twinkle_stars'.
 #-------------------------------------------------------------------------------
 class Star(Circle):
     def __init__(self, spawn_point):
@@ -384,21 +681,18 @@ class Star(Circle):
         Circle.__init__(self, self.position, self.radius, self.rotation,
                         self.color)
 
-    def twinkle(self):
-        if ((self.color[0] + self.twinkle_rate > 255) or
-            (self.color[0] + self.twinkle_rate < 0)):
-            self.twinkle_rate *= -1
-        b = self.color[0] + self.twinkle_rate
-        self.color = (b, b, b)
-
 #-------------------------------------------------------------------------------
 #       Class: Point
 #
-# Description: A simple point class for handling x,y coordinates.
+# Description: A simple point class for handling x,y coordinates. Points are
+#              mutable (shapes move by updating their positions in place), so
+#              a shape keeps its own copy of any point it's given.
 #
-#     Methods: __init__, __str__, __repr__, __eq__, pair
+#     Methods: __init__, __str__, __repr__, __eq__, copy, pair
 #-------------------------------------------------------------------------------
 class Point:
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         self.x = float(x)
         self.y = float(y)
@@ -410,7 +704,12 @@ class Point:
         return self.__str__()
 
     def __eq__(self, other):
+        if other is self:
+            return True
         return self.x == other.x and self.y == other.y
 
+    def copy(self):
+        return Point(self.x, self.y)
+
     def pair(self):
         return (int(round(self.x)), int(round(self.y)))
@@ -0,0 +1,69 @@
+#-------------------------------------------------------------------------------
+#    Filename: spatial_hash.py
+#
+#      Author: David C. Drake (https://davidcdrake.com)
+#
+# Description: Contains a 'SpatialHash' class for broad-phase collision checks
+#              in an Asteroids game.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+#       Class: SpatialHash
+#
+# Description: A uniform grid that buckets objects (given as circles or
+#              axis-aligned bounding boxes) by the cells they overlap, so that
+#              collision candidates for a given circle or box can be found
+#              without scanning every object.
+#
+#     Methods: __init__, clear, insert, insert_aabb, query, query_aabb,
+#              _cell_range
+#-------------------------------------------------------------------------------
+class SpatialHash:
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    # Adds the given index to every cell overlapped by the given circle.
+    def insert(self, index, x, y, radius):
+        self.insert_aabb(index, (x - radius, x + radius, y - radius,
+                                 y + radius))
+
+    # Adds the given index to every cell overlapped by the given bounding box,
+    # as (min_x, max_x, min_y, max_y).
+    def insert_aabb(self, index, aabb):
+        (min_cx, max_cx, min_cy, max_cy) = self._cell_range(aabb)
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [index]
+                else:
+                    bucket.append(index)
+
+    # Appends to 'out' the indices stored in every cell overlapped by the given
+    # circle. An index spanning several cells may be appended more than once.
+    def query(self, x, y, radius, out):
+        return self.query_aabb((x - radius, x + radius, y - radius,
+                                y + radius), out)
+
+    # Like 'query', but for a bounding box given as (min_x, max_x, min_y,
+    # max_y).
+    def query_aabb(self, aabb, out):
+        (min_cx, max_cx, min_cy, max_cy) = self._cell_range(aabb)
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is not None:
+                    out.extend(bucket)
+        return out
+
+    def _cell_range(self, aabb):
+        (min_x, max_x, min_y, max_y) = aabb
+        size = self.cell_size
+        return (int(min_x // size), int(max_x // size), int(min_y // size),
+                int(max_y // size))